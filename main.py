@@ -1,15 +1,30 @@
 # app.py
 
 from io import BytesIO
-from flask import Flask, render_template, redirect, url_for, session, flash, request, send_file
+from flask import Flask, render_template, redirect, url_for, session, flash, request, send_file, abort, g, Response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, func, update, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import defer, raiseload
 from flask_wtf import FlaskForm
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import MultiDict
+from jinja2 import FileSystemBytecodeCache
 from wtforms import StringField, PasswordField, SubmitField, FileField, BooleanField, FloatField
-from wtforms.validators import InputRequired, Email, Length, DataRequired
+from wtforms.validators import InputRequired, Email, Length, DataRequired, Optional
 from werkzeug.security import generate_password_hash, check_password_hash
-import base64
+from argon2 import PasswordHasher
+import bcrypt
+from argon2.exceptions import VerificationError, InvalidHashError
+import hashlib
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import uuid
+import contextlib
+import time
 import os
 from urllib.parse import quote_plus
 
@@ -20,6 +35,51 @@ app = Flask(__name__, template_folder='template')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
 app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY")
+# Keep a warm LIFO pool and recycle connections before the load balancer's idle timeout
+# kills them, instead of paying pool_pre_ping's SELECT 1 per checkout. The pool is per process:
+# size it so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under PostgreSQL's max_connections.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get("DB_POOL_SIZE", 5)),
+    'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 5)),
+    'pool_recycle': 280,
+    'pool_use_lifo': True,
+}
+if (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('postgres'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {'options': '-c statement_timeout=5000'}
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get("MAX_CONTENT_LENGTH", 256 * 1024 * 1024))
+app.config['MAX_PROFILE_PIC_SIZE'] = int(os.environ.get("MAX_PROFILE_PIC_SIZE", 5 * 1024 * 1024))
+
+app.config['UPLOAD_FOLDER'] = os.environ.get("UPLOAD_FOLDER", os.path.join(app.instance_path, 'uploads'))
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Let the front-end server copy file bytes: X-Sendfile for Apache/lighttpd, or X-Accel-Redirect
+# for nginx, where the prefix is an `internal` location aliased to UPLOAD_FOLDER.
+app.config['USE_X_SENDFILE'] = os.environ.get("USE_X_SENDFILE") == "1"
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get("X_ACCEL_REDIRECT_PREFIX")
+
+CHUNK_SIZE = 1 << 20  # 1 MiB per read when streaming file data
+# Profile pictures are identified by their magic bytes, never by the client-supplied type
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+PAGE_SIZE = 20  # rows per page for the file and announcement lists
+
+# argon2id at ~10ms per hash; memory_cost is in KiB (19 MiB per hash in flight)
+ph = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+# Verified against when the email is unknown, so a miss does the same work as a wrong password
+DUMMY_HASH = ph.hash("not-a-password")
+# Failed logins are padded to at least this long: accounts still on slower legacy hashes
+# (pbkdf2, bcrypt) would otherwise answer measurably slower than an unknown email.
+LOGIN_FAILURE_MIN_SECONDS = float(os.environ.get("LOGIN_FAILURE_MIN_SECONDS", 0.5))
+
+# Compiled templates survive worker restarts, so cold workers skip Jinja's parse/compile step
+# (with no JINJA_CACHE_DIR, Jinja picks a private per-uid temp dir and refuses one owned by someone else)
+app.config['JINJA_CACHE_DIR'] = os.environ.get("JINJA_CACHE_DIR")
+if app.config['JINJA_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_CACHE_DIR'], mode=0o700, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
 
 db = SQLAlchemy(app)
 
@@ -27,7 +87,7 @@ db = SQLAlchemy(app)
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=False)  # unique via ix_user_email_login
     password = db.Column(db.String(255), nullable=False)
     year = db.Column(db.String(10))
     department = db.Column(db.String(50))
@@ -35,14 +95,23 @@ class User(db.Model):
     balance = db.Column(db.Float, default=0.0)
     profile_pic = db.Column(db.LargeBinary)
     pic_mimetype = db.Column(db.String(50))
+    pic_etag = db.Column(db.String(40))
     is_admin = db.Column(db.Boolean, default=False)
+    perm_version = db.Column(db.Integer, default=0, nullable=False)  # bump to invalidate existing sessions
+
+    # Enforces email uniqueness and, on PostgreSQL 11+, lets login answer from the index alone (no heap fetch)
+    __table_args__ = (
+        db.Index('ix_user_email_login', 'email', unique=True,
+                 postgresql_include=['id', 'password', 'is_admin', 'username', 'perm_version']),
+    )
 
 class File(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(100))
     filetype = db.Column(db.String(50))
     year = db.Column(db.String(10))
-    data = db.Column(db.LargeBinary)
+    storage_key = db.Column(db.String(64))  # name under UPLOAD_FOLDER
+    data = db.Column(db.LargeBinary)  # legacy rows only; moved to disk on first access
 
 class Announcement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -50,9 +119,21 @@ class Announcement(db.Model):
     content = db.Column(db.String(3000))
 
 # ------------------- Forms -------------------
+# Validators are stateless, so forms share single instances instead of building their own
+required = InputRequired()
+data_required = DataRequired()
+optional = Optional()
+valid_email = Email()
+min_password_length = Length(min=4)
+# Match the column sizes so oversize input is a form error, not a DataError on INSERT
+username_length = Length(max=User.username.type.length)
+email_length = Length(max=User.email.type.length)
+year_length = Length(max=User.year.type.length)
+department_length = Length(max=User.department.type.length)
+
 class LoginForm(FlaskForm):
-    email = StringField('Email', validators=[InputRequired(), Email()])
-    password = PasswordField('Password', validators=[InputRequired(), Length(min=4)])
+    email = StringField('Email', validators=[required, valid_email])
+    password = PasswordField('Password', validators=[required, min_password_length])
     submit = SubmitField('Login')
 
 class ProfilePicForm(FlaskForm):
@@ -60,39 +141,234 @@ class ProfilePicForm(FlaskForm):
     submit = SubmitField('Change Picture')
 
 class UserForm(FlaskForm):
-    username = StringField('Username', validators=[InputRequired()])
-    email = StringField('Email', validators=[InputRequired(), Email()])
+    username = StringField('Username', validators=[required, username_length])
+    email = StringField('Email', validators=[required, valid_email, email_length])
     password = PasswordField('Password')
-    year = StringField('Year')
-    department = StringField('Department')
-    balance = FloatField('Balance', default=0.0)
-    amount_paid = FloatField('Amount Paid', default=0.0)
-    is_admin = BooleanField('Admin')
+    year = StringField('Year', validators=[year_length])
+    department = StringField('Department', validators=[department_length])
+    balance = FloatField('Balance', default=0.0, validators=[optional])
+    amount_paid = FloatField('Amount Paid', default=0.0, validators=[optional])
+    is_admin = BooleanField('Admin', false_values=(False, 'false', 'no', '0', ''))
     submit = SubmitField('Save')
 
 class PasswordResetForm(FlaskForm):
-    password = PasswordField('New Password', validators=[InputRequired(), Length(min=4)])
+    password = PasswordField('New Password', validators=[required, min_password_length])
     submit = SubmitField('Reset Password')
 
+class BulkUserForm(FlaskForm):
+    users_csv = FileField('Users CSV', validators=[data_required])
+    submit = SubmitField('Import CSV')
+
 class UploadFile(FlaskForm):
-    file = FileField('Choose a file', validators=[DataRequired()])
-    studentYear = StringField('Student Year', validators=[DataRequired()])
+    file = FileField('Choose a file', validators=[data_required])
+    studentYear = StringField('Student Year', validators=[data_required])
     submit = SubmitField('Upload File')
 
 # ------------------- Helper Functions -------------------
-def create_user(username, email, password, year="", department="", balance=0.0, is_admin=False):
-    if not User.query.filter_by(email=email).first():
-        hashed_pwd = generate_password_hash(password)
-        user = User(username=username, email=email, password=hashed_pwd,
-                    year=year, department=department, balance=balance, is_admin=is_admin)
-        db.session.add(user)
-        db.session.commit()
+def hash_password(password):
+    return ph.hash(password)
+
+def verify_argon2(password_hash, password):
+    try:
+        return ph.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def verify_bcrypt(password_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+    except ValueError:  # malformed salt/hash, e.g. a truncated import
+        return False
+
+# Hash scheme -> verifier. Legacy bcrypt and werkzeug hashes stay valid until the next login re-hashes them.
+PASSWORD_VERIFIERS = {
+    'argon2id': verify_argon2,
+    'argon2i': verify_argon2,
+    'argon2d': verify_argon2,
+    '2b': verify_bcrypt,
+    '2a': verify_bcrypt,
+    '2y': verify_bcrypt,
+    'pbkdf2': check_password_hash,
+    'scrypt': check_password_hash,
+}
+
+def hash_scheme(password_hash):
+    """'$argon2id$...' -> 'argon2id', '$2b$...' -> '2b', 'pbkdf2:sha256:...' -> 'pbkdf2'."""
+    if password_hash.startswith('$'):
+        return password_hash.split('$', 2)[1]
+    return password_hash.split(':', 1)[0]
+
+def verify_password(password_hash, password):
+    verifier = PASSWORD_VERIFIERS.get(hash_scheme(password_hash))
+    return verifier is not None and verifier(password_hash, password)
+
+def password_needs_rehash(password_hash):
+    return hash_scheme(password_hash) != 'argon2id' or ph.check_needs_rehash(password_hash)
+
+def warm_up_password_hashing():
+    """Run every verifier once so a worker's first login doesn't pay for argon2/OpenSSL/bcrypt lazy setup."""
+    verify_password(DUMMY_HASH, "warm-up")
+    verify_password(generate_password_hash("warm-up", method="pbkdf2:sha256:1"), "warm-up")
+    verify_password(bcrypt.hashpw(b"warm-up", bcrypt.gensalt(rounds=4)).decode('ascii'), "warm-up")
+
+# Module import happens once per gunicorn worker (or once in the master with --preload, inherited on fork)
+warm_up_password_hashing()
+
+def image_mimetype(data):
+    """Return the image type of data if it is a PNG, JPEG, GIF or WebP, otherwise None."""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def create_user(username, email, password, year="", department="", balance=0.0, is_admin=False, amount_paid=0.0):
+    """Create a user unless the email or username is taken; returns whether a user was created.
+
+    The unique indexes arbitrate in a single INSERT, so there is no check-then-insert race.
+    """
+    stmt = insert(User).values(
+        username=username, email=email, password=hash_password(password), year=year, department=department,
+        balance=balance, amount_paid=amount_paid, is_admin=is_admin
+    ).on_conflict_do_nothing().returning(User.id)
+    created = db.session.execute(stmt).scalar() is not None
+    db.session.commit()
+    if created:
         print(f"✅ User {email} created! Admin={is_admin}")
+    return created
+
+def stream_file_data(file_id):
+    """Yield a stored file's bytes one CHUNK_SIZE slice at a time, so the blob is never held whole in memory."""
+    offset = 1  # SQL substr() is 1-based
+    while True:
+        chunk = db.session.execute(
+            select(func.substr(File.data, offset, CHUNK_SIZE)).where(File.id == file_id)
+        ).scalar()
+        if not chunk:
+            break
+        yield bytes(chunk)
+        offset += len(chunk)
+
+def file_page(after_id=None, newest_first=True):
+    """Return one page of file metadata and the id to continue after (None on the last page).
+
+    Keyset pagination on the primary key, so a deep page costs the same as the first.
+    """
+    stmt = select(File.id, File.filename, File.filetype, File.year).limit(PAGE_SIZE + 1)
+    if newest_first:
+        stmt = stmt.order_by(File.id.desc())
+        if after_id is not None:
+            stmt = stmt.where(File.id < after_id)
+    else:
+        stmt = stmt.order_by(File.id.asc())
+        if after_id is not None:
+            stmt = stmt.where(File.id > after_id)
+    rows = db.session.execute(stmt).all()
+    next_after = rows[PAGE_SIZE - 1].id if len(rows) > PAGE_SIZE else None
+    return rows[:PAGE_SIZE], next_after
+
+def announcement_page(newest_first=True):
+    order = Announcement.id.desc() if newest_first else Announcement.id.asc()
+    return db.paginate(select(Announcement).order_by(order), page=request.args.get('page', 1, type=int),
+                       per_page=PAGE_SIZE, error_out=False)
+
+def stored_file_path(storage_key):
+    return os.path.join(app.config['UPLOAD_FOLDER'], storage_key)
+
+def save_chunks(chunks):
+    """Write an iterable of byte chunks to a new file under UPLOAD_FOLDER and return its storage key."""
+    storage_key = uuid.uuid4().hex
+    path = stored_file_path(storage_key)
+    try:
+        with open(path + '.part', 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + '.part')
+        raise
+    os.replace(path + '.part', path)
+    return storage_key
+
+def remove_stored_file(storage_key):
+    if storage_key and os.path.exists(stored_file_path(storage_key)):
+        os.remove(stored_file_path(storage_key))
+
+def commit_or_remove(storage_key):
+    """Commit the row that references storage_key; if the commit fails, don't leave the file orphaned."""
+    try:
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        remove_stored_file(storage_key)
+        raise
+
+def move_file_to_disk(file):
+    """Migrate a file whose bytes still live in File.data out to UPLOAD_FOLDER.
+
+    Returns the storage key, or None if another request is migrating the same row right now.
+    """
+    # SKIP LOCKED: a concurrent first download doesn't queue behind the copy (and hit statement_timeout)
+    row = db.session.execute(
+        select(File.storage_key).where(File.id == file.id).with_for_update(skip_locked=True)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        return None
+    if row.storage_key:
+        db.session.commit()
+        return row.storage_key
+    if db.engine.dialect.name == 'postgresql':
+        # Slicing a compressed TOAST value decompresses it from the start each time,
+        # so the late chunks of a large blob can take longer than the global timeout
+        db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    storage_key = save_chunks(stream_file_data(file.id))
+    db.session.execute(update(File).where(File.id == file.id).values(storage_key=storage_key, data=None))
+    commit_or_remove(storage_key)
+    return storage_key
+
+def file_response(file, as_attachment=False):
+    storage_key = file.storage_key or move_file_to_disk(file)
+    if storage_key is None:
+        # Another request holds the migration lock; serve this one from a single consistent read
+        storage_key, data = db.session.execute(
+            select(File.storage_key, File.data).where(File.id == file.id)
+        ).one()
+        if storage_key is None:
+            return send_file(BytesIO(data or b''), mimetype=file.filetype, download_name=file.filename,
+                             as_attachment=as_attachment)
+    if app.config['X_ACCEL_REDIRECT_PREFIX']:
+        response = Response(mimetype=file.filetype or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = app.config['X_ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + storage_key
+        response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                             filename=file.filename)
+        return response
+    # send_file honours USE_X_SENDFILE; otherwise ETag/Last-Modified let browsers revalidate with a 304
+    return send_file(
+        stored_file_path(storage_key),
+        mimetype=file.filetype,
+        download_name=file.filename,
+        as_attachment=as_attachment,
+        conditional=True,
+        etag=True
+    )
+
+@app.before_request
+def load_current_user():
+    """Fetch the logged-in user once per request; the decorators and views read it from g."""
+    g.current_user = None
+    if 'user_id' in session and request.endpoint != 'static':
+        g.current_user = db.session.get(User, session['user_id'],
+                                        options=[defer(User.profile_pic), defer(User.password)])
+        if g.current_user is None or g.current_user.perm_version != session.get('perm_version'):
+            session.clear()
+            g.current_user = None
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if g.current_user is None:
             flash("You must login first!", "warning")
             return redirect(url_for('login'))
         return f(*args, **kwargs)
@@ -101,8 +377,8 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user = User.query.get(session.get('user_id'))
-        if not user or not user.is_admin:
+        # load_current_user already fetched the row, so this reflects the database without another query
+        if not g.current_user.is_admin:
             flash("Access denied — admin only area!", "danger")
             return redirect(url_for('dashboard'))
         return f(*args, **kwargs)
@@ -113,14 +389,23 @@ def admin_required(f):
 def login():
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if not user:
-            flash("No account found with that email.", "danger")
-        elif not check_password_hash(user.password, form.password.data):
-            flash("Incorrect password. Please try again.", "danger")
+        started = time.monotonic()
+        user = db.session.execute(
+            select(User.id, User.password, User.is_admin, User.username, User.perm_version)
+            .where(User.email == form.email.data)
+        ).first()
+        password_ok = verify_password(user.password if user else DUMMY_HASH, form.password.data)
+        if not user or not password_ok:
+            time.sleep(max(0.0, started + LOGIN_FAILURE_MIN_SECONDS - time.monotonic()))
+            flash("Incorrect email or password. Please try again.", "danger")
         else:
+            if password_needs_rehash(user.password):
+                db.session.execute(update(User).where(User.id == user.id)
+                                   .values(password=hash_password(form.password.data)))
+                db.session.commit()
             session['user_id'] = user.id
             session['is_admin'] = user.is_admin
+            session['perm_version'] = user.perm_version
             flash(f"Welcome {user.username}!", "success")
             return redirect(url_for('admin_dashboard') if user.is_admin else url_for('dashboard'))
     elif form.is_submitted() and not form.validate():
@@ -130,29 +415,72 @@ def login():
 @app.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
-    user = User.query.get(session['user_id'])
+    user = g.current_user
     form = ProfilePicForm()
-    messages = Announcement.query.order_by(Announcement.id.desc()).all()
+    messages = announcement_page()
 
     if form.validate_on_submit() and form.profile_pic.data:
         file = form.profile_pic.data
-        user.profile_pic = file.read()
-        user.pic_mimetype = file.mimetype
-        db.session.commit()
-        flash("Profile picture updated!", "success")
-    pic_data = base64.b64encode(user.profile_pic).decode('utf-8') if user.profile_pic else None
-    files = File.query.order_by(File.id.desc()).all()
-    return render_template('dashboard.html', user=user, form=form, pic_data=pic_data, files=files, messages=messages)
+        # Werkzeug has spooled the upload to disk; read one byte past the cap to detect oversize files
+        data = file.stream.read(app.config['MAX_PROFILE_PIC_SIZE'] + 1)
+        mimetype = image_mimetype(data)
+        if len(data) > app.config['MAX_PROFILE_PIC_SIZE']:
+            flash(f"Profile picture must be under {app.config['MAX_PROFILE_PIC_SIZE'] // (1024 * 1024)} MB.", "danger")
+        elif mimetype is None:
+            flash("Profile picture must be a PNG, JPEG, GIF or WebP image.", "danger")
+        else:
+            user.profile_pic = data
+            user.pic_mimetype = mimetype
+            user.pic_etag = hashlib.sha1(data).hexdigest()
+            db.session.commit()
+            flash("Profile picture updated!", "success")
+    files, next_files_after = file_page(request.args.get('files_after', type=int))
+    return render_template('dashboard.html', user=user, form=form, files=files,
+                           next_files_after=next_files_after, messages=messages)
+
+@app.route('/profile_pic/<int:uid>')
+@login_required
+def profile_pic(uid):
+    if uid != g.current_user.id and not g.current_user.is_admin:
+        abort(404)
+    user = db.get_or_404(User, uid, options=[defer(User.profile_pic)])
+    etag = user.pic_etag
+    if etag and request.if_none_match.contains(etag):
+        # The ETag is computed at upload time, so a revalidation never touches the blob
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.max_age = 3600
+    else:
+        data = user.profile_pic
+        # Re-check the bytes: older rows stored whatever type the client claimed
+        mimetype = image_mimetype(data) if data else None
+        if mimetype is None:
+            abort(404)
+        if not etag:  # pictures uploaded before ETags were stored
+            etag = user.pic_etag = hashlib.sha1(data).hexdigest()
+            db.session.commit()
+        response = send_file(BytesIO(data), mimetype=mimetype, etag=etag, max_age=3600, conditional=True)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 @app.route('/admin')
 @login_required
 @admin_required
 def admin_dashboard():
-    users = User.query.all()
-    files = File.query.order_by(File.id.asc()).all()
-    messages = Announcement.query.order_by(Announcement.id.asc()).all()
+    # List views only need metadata; blob access on these rows should fail loudly, not load megabytes.
+    users = db.session.execute(
+        select(User).options(defer(User.profile_pic, raiseload=True), raiseload('*'))
+    ).scalars().all()
+    files, next_files_after = file_page(request.args.get('files_after', type=int), newest_first=False)
+    messages = announcement_page(newest_first=False)
     form = UploadFile()
-    return render_template('admin_dashboard.html', users=users, form=form, files=files, messages=messages)
+    user_form = UserForm()
+    bulk_form = BulkUserForm()
+    return render_template('admin_dashboard.html', users=users, form=form, user_form=user_form,
+                           bulk_form=bulk_form, files=files,
+                           next_files_after=next_files_after, messages=messages)
 
 @app.route('/upload_file', methods=['POST'])
 @login_required
@@ -165,35 +493,84 @@ def upload_file():
             filename=secure_filename(f.filename),
             filetype=f.content_type,
             year=form.studentYear.data,
-            data=f.read()
+            storage_key=save_chunks(iter(lambda: f.stream.read(CHUNK_SIZE), b''))
         )
         db.session.add(new_file)
-        db.session.commit()
+        commit_or_remove(new_file.storage_key)
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/add', methods=['POST'])
 @login_required
 @admin_required
 def add_user():
-    username = request.form.get('username')
-    email = request.form.get('email')
-    password = request.form.get('password') or "1234"
-    year = request.form.get('year')
-    department = request.form.get('department')
-    balance = float(request.form.get('balance') or 0.0)
-    amount = float(request.form.get('amount_paid') or 0.0)
-    is_admin = bool(int(request.form.get('is_admin', 0)))
-
-    if User.query.filter_by(email=email).first():
-        flash("Email already exists!", "danger")
+    form = UserForm()
+    if not form.validate_on_submit():
+        flash("Please fill in all required fields correctly.", "danger")
+    elif create_user(form.username.data, form.email.data, form.password.data or "1234",
+                     form.year.data, form.department.data, form.balance.data or 0.0,
+                     is_admin=form.is_admin.data, amount_paid=form.amount_paid.data or 0.0):
+        flash(f"User {form.username.data} added!", "success")
     else:
-        hashed_pwd = generate_password_hash(password)
-        user = User(username=username, email=email, password=hashed_pwd,
-                    year=year, department=department, balance=balance, amount_paid=amount, is_admin=is_admin)
-        db.session.add(user)
-        db.session.commit()
-        flash(f"User {username} added!", "success")
+        flash("Email or username already exists!", "danger")
+    return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/add_bulk', methods=['POST'])
+@login_required
+@admin_required
+def add_users_bulk():
+    """Create users from an uploaded CSV with columns matching the Add User form, in one INSERT.
+
+    Every row goes through UserForm, and the file is rejected as a whole if any row is invalid.
+    """
+    form = BulkUserForm()
+    if not form.validate_on_submit():
+        flash("Import failed: choose a CSV file and try again.", "danger")
+        return redirect(url_for('admin_dashboard'))
+
+    try:
+        reader = csv.DictReader(io.TextIOWrapper(form.users_csv.data.stream, encoding='utf-8-sig'))
+        raw_rows = list(reader)
+    except (UnicodeDecodeError, csv.Error):
+        flash("Import failed: the file is not a UTF-8 CSV.", "danger")
+        return redirect(url_for('admin_dashboard'))
+
+    rows = []
+    for line_no, raw in enumerate(raw_rows, start=2):  # line 1 is the header
+        fields = {key: value.strip() for key, value in raw.items() if key and isinstance(value, str)}
+        if 'is_admin' in fields:
+            fields['is_admin'] = fields['is_admin'].lower()
+        row = UserForm(formdata=MultiDict(fields), meta={'csrf': False})
+        if not row.validate():
+            field, errors = next(iter(row.errors.items()))
+            flash(f"Import failed: line {line_no}, {field}: {errors[0]}", "danger")
+            return redirect(url_for('admin_dashboard'))
+        rows.append(row)
+
+    existing = set(db.session.execute(
+        select(User.email).where(User.email.in_([row.email.data for row in rows]))
+    ).scalars())
+    new_rows = []
+    for row in rows:
+        if row.email.data not in existing:
+            existing.add(row.email.data)
+            new_rows.append(row)
+    if not new_rows:
+        flash("No new users found in the file.", "warning")
+        return redirect(url_for('admin_dashboard'))
+
+    # argon2-cffi releases the GIL while hashing, so threads spread the work across cores.
+    # One thread per core: more adds no throughput, only another 19 MiB per hash in flight.
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        hashes = list(executor.map(hash_password, [row.password.data or "1234" for row in new_rows]))
+
+    users = [dict(username=row.username.data, email=row.email.data, password=hashed_pwd,
+                  year=row.year.data, department=row.department.data,
+                  balance=row.balance.data or 0.0, amount_paid=row.amount_paid.data or 0.0,
+                  is_admin=row.is_admin.data)
+             for row, hashed_pwd in zip(new_rows, hashes)]
+    created = db.session.execute(insert(User).on_conflict_do_nothing().returning(User.id), users).all()
+    db.session.commit()
+    flash(f"{len(created)} users added!", "success")
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/delete/<int:user_id>', methods=['POST'])
@@ -213,9 +590,11 @@ def delete_user(user_id):
 @login_required
 @admin_required
 def delete_file(file_id):
-    file = File.query.get_or_404(file_id)
+    file = db.get_or_404(File, file_id, options=[defer(File.data)])
+    storage_key = file.storage_key
     db.session.delete(file)
     db.session.commit()
+    remove_stored_file(storage_key)
     flash(f"File '{file.filename}' deleted successfully!", "success")
     return redirect(url_for('admin_dashboard'))
 
@@ -226,7 +605,8 @@ def reset_password(user_id):
     user = User.query.get_or_404(user_id)
     new_password = request.form.get('new_password')
     if new_password:
-        user.password = generate_password_hash(new_password)
+        user.password = hash_password(new_password)
+        user.perm_version += 1
         db.session.commit()
         flash(f"Password for {user.username} reset successfully!", "success")
     return redirect(url_for('admin_dashboard'))
@@ -234,27 +614,19 @@ def reset_password(user_id):
 @app.route('/download/<int:id>')
 @login_required
 def download(id):
-    file = File.query.get_or_404(id)
-    return send_file(
-        BytesIO(file.data),
-        download_name=file.filename,
-        as_attachment=True
-    )
+    file = db.get_or_404(File, id, options=[defer(File.data)])
+    return file_response(file, as_attachment=True)
 
 @app.route('/view/<int:id>')
 @login_required
 def view_file(id):
-    file = File.query.get_or_404(id)
-    return send_file(
-        BytesIO(file.data),
-        mimetype=file.filetype,
-        download_name=file.filename
-    )
+    file = db.get_or_404(File, id, options=[defer(File.data)])
+    return file_response(file)
 
 @app.route('/preview/<int:id>')
 @login_required
 def preview_file(id):
-    file = File.query.get_or_404(id)
+    file = db.get_or_404(File, id, options=[defer(File.data)])
     file_url = url_for('view_file', id=file.id)
     return render_template('preview.html', file=file, file_url=file_url)
 
@@ -288,7 +660,7 @@ def editor():
 @app.route('/logout')
 @login_required
 def logout():
-    session.pop('user_id', None)
+    session.clear()
     flash("Logged out successfully!", "info")
     return redirect(url_for('login'))
 